@@ -1,12 +1,11 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse, ORJSONResponse
+from itertools import islice
 from typing import List, Optional
 from services import chat_service
 import os
 import logging
-import httpx
-from openai import OpenAI
+import msgspec
 from config import settings
 from skills.loader import skill_loader
 from skills.matcher import skill_matcher
@@ -22,26 +21,13 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
 
-# 配置代理（根据你的实际代理地址修改）
-proxies = {
-    "https://": "https://api.deepseek.com",
-}
 
-# 创建带代理的 httpx 客户端
-http_client = httpx.Client(timeout=30.0)
-client = OpenAI(
-    api_key=settings.OPENAI_API_KEY,
-    base_url=settings.OPENAI_BASE_URL,
-    http_client=http_client)  
-
-
-
-class Message(BaseModel):
+class Message(msgspec.Struct):
     role: str  # "user", "assistant", "system"
     content: str
 
 
-class ChatRequest(BaseModel):
+class ChatRequest(msgspec.Struct):
     messages: List[Message]
     model: Optional[str] = None
     stream: bool = False
@@ -52,7 +38,7 @@ class ChatRequest(BaseModel):
 async def list_skills():
     """获取所有可用的 Skills"""
     skills = skill_loader.list_skills()
-    return {
+    return ORJSONResponse({
         "total": len(skills),
         "skills": [
             {
@@ -65,12 +51,18 @@ async def list_skills():
             }
             for skill in skills
         ]
-    }
+    })
 
 
 @router.post("/skills/reload")
 async def reload_skills():
-    """重新加载所有 Skills"""
+    """重新加载所有 Skills（仅单 worker 时可用）"""
+    if settings.WORKERS > 1:
+        # 请求只会落到其中一个 worker，其余进程仍使用旧的 Skills
+        raise HTTPException(
+            status_code=409,
+            detail="多 worker 模式下无法热重载 Skills，请重启服务"
+        )
     skill_loader.reload()
     return {"message": "Skills reloaded successfully"}
 
@@ -82,42 +74,49 @@ async def get_skill_detail(skill_name: str):
     if not skill:
         raise HTTPException(status_code=404, detail=f"Skill '{skill_name}' not found")
     
-    return {
+    return ORJSONResponse({
         "metadata": skill.metadata.model_dump(),
-        "references": list(skill.references.keys())
-    }
+        "references": skill.reference_names
+    })
 
 
 @router.post("/")
-async def chat(request: ChatRequest):
+async def chat(http_request: Request):
     """聊天接口 - 支持自动 Skills 调用"""
-    messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
+    # 使用 msgspec 直接从原始请求体解码并校验
+    try:
+        request = msgspec.json.decode(await http_request.body(), type=ChatRequest)
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    # 一次 C 层转换得到 dict 列表，无需逐条重建
+    messages = msgspec.to_builtins(request.messages)
 
     # 获取用户最新消息
     user_message = messages[-1]["content"] if messages else ""
 
     logger.info(f"收到聊天请求 - enable_skills={request.enable_skills}, user_message='{user_message}'")
 
-    # 创建异步生成器
+    # 创建异步生成器（直接产出 bytes，省去 StreamingResponse 对每个分块的编码）
     async def generate():
         # 步骤1: 如果启用了 Skills，尝试匹配 Skill
         if request.enable_skills and user_message.strip():
             logger.info("开始匹配 Skill...")
-            yield "🔍 分析请求...\n"
+            yield "🔍 分析请求...\n".encode()
 
-            matched = skill_matcher.match_skill(
+            matched = await skill_matcher.match_skill(
                 user_message,
-                messages[:-1]
+                islice(messages, 0, len(messages) - 1)
             )
 
             if matched:
                 skill, confidence = matched
                 logger.info(f"✅ 匹配到 Skill: {skill.metadata.name}, 置信度: {confidence:.2%}")
-                yield f"✅ 找到合适的 Skill: {skill.metadata.name} (置信度: {confidence:.2%})\n\n"
+                yield f"✅ 找到合适的 Skill: {skill.metadata.name} (置信度: {confidence:.2%})\n\n".encode()
 
                 # 执行 Skill
                 logger.info(f"📞 正在执行 Skill: {skill.metadata.name}")
-                yield f"📞 正在执行 Skill: {skill.metadata.name}...\n"
+                yield f"📞 正在执行 Skill: {skill.metadata.name}...\n".encode()
 
                 context = SkillContext(
                     user_message=user_message,
@@ -130,10 +129,10 @@ async def chat(request: ChatRequest):
 
                 if result.success:
                     logger.info(f"✅ Skill 执行成功, 内容长度: {len(result.content)}")
-                    yield f"✅ 执行成功:\n\n{result.content}\n"
+                    yield f"✅ 执行成功:\n\n{result.content}\n".encode()
                 else:
                     logger.error(f"❌ Skill 执行失败: {result.error}")
-                    yield f"❌ 执行失败: {result.error}\n"
+                    yield f"❌ 执行失败: {result.error}\n".encode()
 
                 # 更新对话历史
                 messages.append({
@@ -153,18 +152,28 @@ async def chat(request: ChatRequest):
 
         # 步骤2: 普通 AI 聊天（没有匹配到 Skill 或未启用 Skills）
         logger.info("💭 开始普通 AI 聊天...")
-        yield "💭 正在思考...\n"
+        yield "💭 正在思考...\n".encode()
 
-        stream = client.chat.completions.create(
+        # 复用 chat_service 的 AsyncOpenAI 客户端，逐 token 异步读取，不阻塞事件循环
+        client = await chat_service.get_client()
+        stream = await client.chat.completions.create(
             model=request.model or "deepseek-chat",
             messages=messages,
             stream=True
         )
 
-        for chunk in stream:
+        async for chunk in stream:
             if chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
+                yield chunk.choices[0].delta.content.encode()
 
         logger.info("普通 AI 聊天完成")
 
-    return StreamingResponse(generate(), media_type="text/plain")
+    # 禁止 Nginx / CDN 等代理缓冲，保证逐 token 推送到客户端
+    return StreamingResponse(
+        generate(),
+        media_type="text/plain",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
@@ -10,12 +10,21 @@ class Settings(BaseSettings):
     # 应用配置
     APP_NAME: str = "DeepSeek Chat"
     APP_VERSION: str = "1.0.0"
+    # 每个 worker 进程各自持有 Skills、匹配缓存和 Embedding 模型，多进程需显式开启
+    WORKERS: int = int(os.getenv("WORKERS", 1))
 
     # 聊天配置
     DEFAULT_MODEL: str = "deepseek-chat"
     MAX_TOKENS: int = 2000
     TEMPERATURE: float = 0.7
 
+    # Skill 语义匹配配置（本地 Embedding 模型，支持中英文）
+    EMBEDDING_MODEL: str = "paraphrase-multilingual-MiniLM-L12-v2"
+    # 余弦相似度低于该值视为不相关，高于该值的部分线性映射到 0-1 作为语义得分
+    SEMANTIC_SIMILARITY_FLOOR: float = 0.25
+    # 余弦相似度达到该值的 Skill 才会被使用，否则视为普通聊天（更换模型后用 python -m skills.calibrate 重新评估）
+    SEMANTIC_MIN_SIMILARITY: float = 0.4
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,13 +1,40 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 from api import router as chat_router
 from config import settings
+from services import chat_service
+from skills.loader import skill_loader
+from skills.matcher import skill_matcher
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期 - 启动时创建共享的 OpenAI 客户端并预热 Skill 向量，关闭时停止匹配批处理并释放连接池"""
+    await chat_service.get_client()
+    # 预先加载 Embedding 模型并计算 Skills 向量，避免首个请求等待
+    # 模型不可用时（未安装、离线无法下载等）继续提供服务，失败原因记录在 skill_loader 上，匹配器不再尝试语义匹配
+    try:
+        await asyncio.to_thread(skill_loader.get_skill_embeddings)
+    except ImportError:
+        logger.warning("未安装可选依赖 sentence-transformers，语义匹配不可用，只使用关键词匹配")
+    except Exception as e:
+        logger.error(f"Embedding 模型预热失败，语义匹配暂不可用: {e}")
+    yield
+    await skill_matcher.close()
+    await chat_service.close()
 
 
 app = FastAPI(
     title=settings.APP_NAME,
-    version=settings.APP_VERSION
+    version=settings.APP_VERSION,
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # 注册 API 路由
@@ -30,5 +57,14 @@ async def health():
 
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # 使用 uvloop 事件循环和 httptools 解析器（uvloop 不支持 Windows），多进程需以导入字符串传入 app
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        workers=settings.WORKERS
+    )
@@ -1,21 +1,34 @@
+import httpx
 from openai import AsyncOpenAI
 from config import settings
 
 
 class ChatService:
     def __init__(self):
+        self._http_client = None
         self._client = None
 
-    async def _get_client(self):
-        """延迟初始化 OpenAI 客户端"""
+    async def get_client(self):
+        """延迟初始化 OpenAI 客户端（全局共享连接池，复用 keep-alive 连接）"""
         if self._client is None:
+            self._http_client = httpx.AsyncClient(
+                timeout=60.0,
+                limits=httpx.Limits(max_keepalive_connections=100)
+            )
             self._client = AsyncOpenAI(
                 api_key=settings.OPENAI_API_KEY,
                 base_url=settings.OPENAI_BASE_URL,
-                timeout=60.0
+                http_client=self._http_client
             )
         return self._client
 
+    async def close(self):
+        """关闭共享的 HTTP 连接池"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        self._http_client = None
+        self._client = None
+
     async def chat(self, messages: list, model: str = None) -> str:
         """
         发送聊天请求到 DeepSeek
@@ -24,7 +37,7 @@ class ChatService:
         :return: AI 响应
         """
         try:
-            client = await self._get_client()
+            client = await self.get_client()
 
             response = await client.chat.completions.create(
                 model=model or settings.DEFAULT_MODEL,
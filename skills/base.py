@@ -4,14 +4,84 @@ Skills 基类 - 所有自定义 Skills 都应该继承这个类
 """
 import os
 import re
-import json
-import yaml
+import msgspec
+import orjson
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List
+from functools import cached_property
+from typing import Dict, Any, Optional, List, FrozenSet
 from pathlib import Path
 from pydantic import BaseModel
 
 
+# SKILL.md 的 frontmatter
+_FRONTMATTER_RE = re.compile(r"^---\n(.*?)\n---", re.DOTALL)
+# 英文单词（长度 >= 3）
+_KEYWORD_RE = re.compile(r'\b[a-zA-Z]{3,}\b')
+
+# 纯量值以这些字符开头时属于复杂 YAML 语法，交给 PyYAML 解析
+_YAML_SPECIAL_PREFIXES = ('{', '&', '*', '!', '|', '>', '@', '`', '%')
+
+# 常见的技术术语和动作词，用于关键词匹配
+ACTION_WORDS = [
+    'review', 'search', 'find', 'install', 'get', 'use', 'create',
+    'generate', 'execute', 'run', 'code', 'test', 'debug', 'fix',
+    '分析', '搜索', '查找', '安装', '获取', '使用', '创建', '生成',
+    '执行', '运行', '代码', '测试', '调试', '修复', '审查', '计算'
+]
+
+
+def _parse_frontmatter_scalar(value: str) -> Optional[str]:
+    """解析单个纯量值，无法确定含义时抛出 ValueError"""
+    if not value or value in ('~', 'null', 'Null', 'NULL'):
+        return None
+    if value[0] in ('"', "'"):
+        quote = value[0]
+        inner = value[1:-1]
+        # 含转义或嵌套引号的字符串交给 PyYAML
+        if len(value) < 2 or value[-1] != quote or quote in inner or '\\' in inner:
+            raise ValueError(value)
+        return inner
+    if value.startswith(_YAML_SPECIAL_PREFIXES) or ': ' in value or ' #' in value:
+        raise ValueError(value)
+    return value
+
+
+def _parse_frontmatter(text: str) -> Optional[Dict[str, Any]]:
+    """
+    轻量解析 SKILL.md frontmatter，支持单行 key: value 和 [a, b, c] 形式的列表
+    
+    Returns:
+        解析结果；遇到不支持的语法（多行值、嵌套结构、转义等）时返回 None
+    """
+    result: Dict[str, Any] = {}
+    try:
+        for line in text.splitlines():
+            stripped = line.strip()
+            if not stripped or stripped.startswith('#'):
+                continue
+            # 缩进行属于多行值或嵌套结构
+            if line[0].isspace():
+                return None
+            
+            key, sep, value = line.partition(':')
+            key = key.strip()
+            value = value.strip()
+            if not sep or not key:
+                return None
+            
+            if value.startswith('['):
+                if not value.endswith(']') or '[' in value[1:] or '"' in value or "'" in value:
+                    return None
+                items = [item.strip() for item in value[1:-1].split(',')]
+                result[key] = [_parse_frontmatter_scalar(item) for item in items if item]
+            else:
+                result[key] = _parse_frontmatter_scalar(value)
+    except ValueError:
+        return None
+    
+    return result
+
+
 class SkillMetadata(BaseModel):
     """Skill 元数据"""
     name: str
@@ -22,14 +92,14 @@ class SkillMetadata(BaseModel):
     version: Optional[str] = "1.0.0"
 
 
-class SkillContext(BaseModel):
-    """Skill 执行上下文"""
+class SkillContext(msgspec.Struct, kw_only=True):
+    """Skill 执行上下文（msgspec Struct，构造时不做运行时校验）"""
     user_message: str
     conversation_history: List[Dict[str, Any]]
     variables: Dict[str, Any] = {}
 
 
-class SkillResult(BaseModel):
+class SkillResult(msgspec.Struct, kw_only=True):
     """Skill 执行结果"""
     success: bool
     content: str
@@ -42,8 +112,16 @@ class BaseSkill(ABC):
     
     def __init__(self, skill_dir: Path):
         self.skill_dir = skill_dir
+        # SKILL.md 只读取一次：全文缓存后供元数据解析、关键词提取和执行共用
+        self._full_content = self._load_full_content()
         self._metadata = self._load_metadata()
-        self._references = self._load_references()
+        # 只记录参考文档路径，内容在首次使用时才读取
+        self._reference_paths = self._find_references()
+        # 缓存关键词，避免每次匹配都重新分词
+        self._keywords = frozenset(
+            self._extract_keywords(self._metadata.description)
+            + self._extract_keywords(self._full_content)
+        )
     
     @abstractmethod
     async def execute(self, context: SkillContext) -> SkillResult:
@@ -51,22 +129,17 @@ class BaseSkill(ABC):
         pass
     
     def _load_metadata(self) -> SkillMetadata:
-        """从 SKILL.md 加载元数据"""
-        skill_md_file = self.skill_dir / "SKILL.md"
-        if not skill_md_file.exists():
-            return SkillMetadata(
-                name=self.skill_dir.name,
-                description="No description available"
-            )
-        
-        content = skill_md_file.read_text(encoding="utf-8")
-        
-        # 解析 frontmatter
-        frontmatter_match = re.match(r"^---\n(.*?)\n---", content, re.DOTALL)
+        """从已缓存的 SKILL.md 内容解析元数据"""
+        # 解析 frontmatter（SKILL.md 不存在时内容为空，使用默认元数据）
+        frontmatter_match = _FRONTMATTER_RE.match(self._full_content)
         if frontmatter_match:
             frontmatter_text = frontmatter_match.group(1)
             try:
-                frontmatter = yaml.safe_load(frontmatter_text) or {}
+                frontmatter = _parse_frontmatter(frontmatter_text)
+                if frontmatter is None:
+                    # 超出简单 key: value 语法时回退到完整的 YAML 解析
+                    import yaml
+                    frontmatter = yaml.safe_load(frontmatter_text) or {}
                 return SkillMetadata(**frontmatter)
             except Exception:
                 pass
@@ -76,29 +149,76 @@ class BaseSkill(ABC):
             description="No description available"
         )
     
-    def _load_references(self) -> Dict[str, str]:
-        """加载 references 目录下的所有参考文档"""
+    def _find_references(self) -> Dict[str, Path]:
+        """查找 references 目录下的所有参考文档"""
         references_dir = self.skill_dir / "references"
-        references = {}
+        reference_paths = {}
         
         if not references_dir.exists():
-            return references
+            return reference_paths
         
-        for ref_file in references_dir.glob("**/*.md"):
+        for ref_file in references_dir.rglob("*.md"):
             relative_path = ref_file.relative_to(references_dir)
-            references[str(relative_path)] = ref_file.read_text(encoding="utf-8")
+            reference_paths[str(relative_path)] = ref_file
+        
+        return reference_paths
+    
+    def _load_full_content(self) -> str:
+        """读取 SKILL.md 的完整内容"""
+        skill_md_file = self.skill_dir / "SKILL.md"
+        if skill_md_file.exists():
+            return skill_md_file.read_text(encoding="utf-8")
+        return ""
+    
+    @staticmethod
+    def _extract_keywords(text: str) -> List[str]:
+        """从文本中提取关键词"""
+        # 简单的关键词提取：提取英文单词和常见中文术语
+        keywords = []
+        text_lower = text.lower()
+        
+        # 提取英文单词（长度 >= 3）
+        english_words = _KEYWORD_RE.findall(text_lower)
+        keywords.extend(english_words)
         
-        return references
+        # 提取常见的技术术语和动作词
+        for word in ACTION_WORDS:
+            if word in text_lower:
+                keywords.append(word)
+        
+        return list(set(keywords))
     
     @property
     def metadata(self) -> SkillMetadata:
         """获取 Skill 元数据"""
         return self._metadata
     
-    @property
+    @cached_property
     def references(self) -> Dict[str, str]:
-        """获取参考文档"""
-        return self._references
+        """获取所有参考文档（首次访问时读取）"""
+        return {
+            name: path.read_text(encoding="utf-8")
+            for name, path in self._reference_paths.items()
+        }
+    
+    @property
+    def reference_names(self) -> List[str]:
+        """获取参考文档名称列表"""
+        return list(self._reference_paths)
+    
+    def read_reference(self, name: str) -> Optional[str]:
+        """读取单个参考文档，不存在时返回 None"""
+        if "references" in self.__dict__:
+            return self.references.get(name)
+        path = self._reference_paths.get(name)
+        if path is None:
+            return None
+        return path.read_text(encoding="utf-8")
+    
+    @property
+    def keywords(self) -> FrozenSet[str]:
+        """获取预先提取的关键词集合"""
+        return self._keywords
     
     @property
     def enabled(self) -> bool:
@@ -107,10 +227,30 @@ class BaseSkill(ABC):
     
     def get_full_content(self) -> str:
         """获取 SKILL.md 的完整内容"""
-        skill_md_file = self.skill_dir / "SKILL.md"
-        if skill_md_file.exists():
-            return skill_md_file.read_text(encoding="utf-8")
-        return ""
+        return self._full_content
+
+
+# 供模型按需读取参考文档的工具定义
+READ_REFERENCE_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "read_reference",
+        "description": "读取 Skill 的参考文档内容",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "name": {
+                    "type": "string",
+                    "description": "参考文档名称，必须是参考文档列表中的一项"
+                }
+            },
+            "required": ["name"]
+        }
+    }
+}
+
+# 单次执行中最多允许的参考文档读取轮数
+MAX_REFERENCE_ROUNDS = 3
 
 
 # 动态导入的 Python Skill 基类
@@ -120,11 +260,9 @@ class DynamicPythonSkill(BaseSkill):
     async def execute(self, context: SkillContext) -> SkillResult:
         """执行 Skill - 使用 AI 来理解和执行 SKILL.md 中的指令"""
         try:
-            from openai import OpenAI
-            from config import settings
-            import httpx
+            from services import chat_service
 
-            # 构建提示词
+            # 构建提示词（参考文档只列出名称，由模型通过 read_reference 按需读取）
             prompt = f"""你是一个专业的 AI 助手，需要根据以下 Skill 指令来处理用户的请求。
 
 ## Skill 信息
@@ -135,36 +273,57 @@ class DynamicPythonSkill(BaseSkill):
 {self.get_full_content()}
 
 ## 参考文档
-{json.dumps(self.references, ensure_ascii=False, indent=2)}
+{orjson.dumps(self.reference_names, option=orjson.OPT_INDENT_2).decode()}
 
 ## 用户请求
 {context.user_message}
 
 ## 对话历史
-{json.dumps(context.conversation_history[-5:], ensure_ascii=False, indent=2)}
+{orjson.dumps(context.conversation_history[-5:], option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()}
 
-请根据 Skill 指令处理用户请求，并返回适当的响应。不要提到 Skill，直接回答用户的问题。
+请根据 Skill 指令处理用户请求，并返回适当的响应。如果需要参考文档的内容，请调用 read_reference 工具读取。不要提到 Skill，直接回答用户的问题。
 """
 
-            # 调用 AI
-            http_client = httpx.Client(timeout=30.0)
-            client = OpenAI(
-                api_key=settings.OPENAI_API_KEY,
-                base_url=settings.OPENAI_BASE_URL,
-                http_client=http_client
-            )
+            # 调用 AI（复用全局共享的客户端）
+            client = await chat_service.get_client()
 
-            response = client.chat.completions.create(
-                model="deepseek-chat",
-                messages=[
-                    {"role": "system", "content": "你是一个执行 Skill 指令的 AI 助手。"},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=2000,
-                temperature=0.7
-            )
+            messages = [
+                {"role": "system", "content": "你是一个执行 Skill 指令的 AI 助手。"},
+                {"role": "user", "content": prompt}
+            ]
+
+            for round_index in range(MAX_REFERENCE_ROUNDS + 1):
+                # 没有参考文档或已达到读取轮数上限时不再提供工具，要求模型直接回答
+                tool_kwargs = {}
+                if self.reference_names and round_index < MAX_REFERENCE_ROUNDS:
+                    tool_kwargs["tools"] = [READ_REFERENCE_TOOL]
+
+                response = await client.chat.completions.create(
+                    model="deepseek-chat",
+                    messages=messages,
+                    max_tokens=2000,
+                    temperature=0.7,
+                    **tool_kwargs
+                )
 
-            content = response.choices[0].message.content
+                message = response.choices[0].message
+                if not message.tool_calls:
+                    break
+
+                # 读取模型请求的参考文档，作为工具结果返回
+                messages.append({
+                    "role": "assistant",
+                    "content": message.content or "",
+                    "tool_calls": [tool_call.model_dump() for tool_call in message.tool_calls]
+                })
+                for tool_call in message.tool_calls:
+                    messages.append({
+                        "role": "tool",
+                        "tool_call_id": tool_call.id,
+                        "content": self._run_reference_tool(tool_call.function.arguments)
+                    })
+
+            content = message.content or ""
 
             return SkillResult(
                 success=True,
@@ -178,3 +337,15 @@ class DynamicPythonSkill(BaseSkill):
                 content="",
                 error=str(e)
             )
+    
+    def _run_reference_tool(self, arguments: str) -> str:
+        """执行 read_reference 工具调用"""
+        try:
+            name = orjson.loads(arguments or "{}").get("name", "")
+        except (ValueError, AttributeError):
+            return "参数格式错误"
+        
+        content = self.read_reference(name)
+        if content is None:
+            return f"未找到参考文档: {name}，可用的参考文档: {', '.join(self.reference_names)}"
+        return content
@@ -1,8 +1,63 @@
+import ast
+import operator
 import re
+from functools import lru_cache
 from pathlib import Path
 from skills.base import BaseSkill, SkillContext, SkillResult
 
 
+# 常见模式：提取数字、运算符、括号
+_EXPR_RE = re.compile(r'[\d+\-*/^().%]+\s*[\d+\-*/^().%\s]*[\d+\-*/^().%]+')
+# 更简单的模式：查找类似 "2 + 3" 的表达式
+_SIMPLE_RE = re.compile(r'[-+]?\d*\.?\d+\s*[\+\-\*/]\s*[-+]?\d*\.?\d+')
+# 合法表达式：只允许数字、运算符、括号、空格和小数点
+_VALID_EXPR_RE = re.compile(r'[0-9+\-*/(). %]+')
+
+# 允许的运算符
+_BIN_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+_UNARY_OPS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+# 整数幂运算结果的最大位数，防止 9^9^9 之类的表达式长时间占用事件循环
+_MAX_POW_BITS = 4096
+
+
+@lru_cache(maxsize=256)
+def _parse_expression(expression: str) -> ast.expr:
+    """将表达式解析为 AST（相同表达式只解析一次）"""
+    return ast.parse(expression, mode='eval').body
+
+
+def _safe_pow(base, exponent):
+    """幂运算，整数结果过大时直接报错（浮点数溢出会立即抛出 OverflowError）"""
+    if (isinstance(base, int) and isinstance(exponent, int)
+            and exponent > 0 and abs(base) > 1
+            and abs(base).bit_length() * exponent > _MAX_POW_BITS):
+        raise ValueError("结果过大")
+    return operator.pow(base, exponent)
+
+
+def _eval_node(node: ast.expr):
+    """遍历 AST 计算结果，只支持数字和白名单中的运算符"""
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+        return _safe_pow(_eval_node(node.left), _eval_node(node.right))
+    if isinstance(node, ast.BinOp) and type(node.op) in _BIN_OPS:
+        return _BIN_OPS[type(node.op)](_eval_node(node.left), _eval_node(node.right))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        return _UNARY_OPS[type(node.op)](_eval_node(node.operand))
+    raise ValueError(f"不支持的语法: {type(node).__name__}")
+
+
 class CalculatorSkill(BaseSkill):
     """计算器 Skill - 自定义 Python 实现"""
 
@@ -32,19 +87,8 @@ class CalculatorSkill(BaseSkill):
 
             # 计算结果
             try:
-                # 限制内置函数，只允许数学相关函数
-                allowed_names = {
-                    '__builtins__': {
-                        'abs': abs,
-                        'round': round,
-                        'min': min,
-                        'max': max,
-                        'pow': pow,
-                        'sum': sum,
-                    }
-                }
-
-                result = eval(expression, allowed_names)
+                # 基于 AST 求值，不经过 eval/编译器
+                result = _eval_node(_parse_expression(expression))
             except Exception as e:
                 return SkillResult(
                     success=False,
@@ -81,9 +125,7 @@ class CalculatorSkill(BaseSkill):
 
     def _extract_expression(self, text: str) -> str:
         """从文本中提取数学表达式"""
-        # 常见模式：提取数字、运算符、括号
-        pattern = r'[\d+\-*/^().%]+\s*[\d+\-*/^().%\s]*[\d+\-*/^().%]+'
-        match = re.search(pattern, text)
+        match = _EXPR_RE.search(text)
 
         if match:
             expr = match.group(0)
@@ -94,9 +136,7 @@ class CalculatorSkill(BaseSkill):
             return expr.strip()
 
         # 如果没找到，尝试更简单的模式
-        # 查找类似 "2 + 3" 的模式
-        simple_pattern = r'[-+]?\d*\.?\d+\s*[\+\-\*/]\s*[-+]?\d*\.?\d+'
-        match = re.search(simple_pattern, text)
+        match = _SIMPLE_RE.search(text)
         if match:
             return match.group(0)
 
@@ -104,6 +144,4 @@ class CalculatorSkill(BaseSkill):
 
     def _is_valid_expression(self, expr: str) -> bool:
         """验证表达式只包含合法字符"""
-        # 只允许数字、运算符、括号、空格和小数点
-        allowed_chars = set('0123456789+-*/(). %')
-        return all(c in allowed_chars for c in expr)
+        return _VALID_EXPR_RE.fullmatch(expr) is not None
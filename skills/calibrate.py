@@ -0,0 +1,100 @@
+# skills/calibrate.py
+"""
+语义匹配阈值评估 - 在标注样例上统计 Embedding 模型的相似度分布，检查当前阈值下的匹配结果
+
+用法: python -m skills.calibrate
+更换 EMBEDDING_MODEL 或修改 Skill 描述后运行，根据输出调整 SEMANTIC_SIMILARITY_FLOOR / SEMANTIC_MIN_SIMILARITY
+"""
+import asyncio
+from typing import List, Optional, Tuple
+import numpy as np
+from .loader import skill_loader
+from .matcher import SkillMatcher
+from .embedding import encode
+
+# (用户消息, 期望使用的 Skill)，None 表示应作为普通聊天处理
+LABELLED_QUERIES: List[Tuple[str, Optional[str]]] = [
+    # 数学计算
+    ("计算 3*4", "calculator"),
+    ("帮我算一下 (12+8)/5", "calculator"),
+    ("123 乘以 45 等于多少", "calculator"),
+    ("what is 15 * 7", "calculator"),
+    ("calculate 2 + 3 * 4", "calculator"),
+    # 前端代码审查
+    ("review my React component in App.tsx", "frontend-code-review"),
+    ("can you check this .ts file for problems before I merge", "frontend-code-review"),
+    ("帮我审查一下这个前端页面的代码", "frontend-code-review"),
+    ("请 review 一下这次前端改动的 diff", "frontend-code-review"),
+    # 创建 Skill
+    ("help me create a new skill for processing PDFs", "skill-creator"),
+    ("how do I write a SKILL.md for my team's workflow", "skill-creator"),
+    ("我想写一个新的 skill 来整理会议纪要", "skill-creator"),
+    ("帮我更新一下现有 skill 的说明和脚本", "skill-creator"),
+    # 查找/安装 Skill
+    ("find me an agent skill for web scraping", "skill-lookup"),
+    ("are there any Claude skills for working with databases", "skill-lookup"),
+    ("有没有现成的 agent skill 可以生成 PPT", "skill-lookup"),
+    ("帮我安装一个处理 Excel 的 skill", "skill-lookup"),
+    # 普通聊天
+    ("hello how are you", None),
+    ("tell me a joke", None),
+    ("what's your name", None),
+    ("how was your weekend", None),
+    ("你好", None),
+    ("今天天气怎么样", None),
+    ("谢谢你的帮助", None),
+    ("推荐几本好看的小说", None),
+]
+
+
+async def main():
+    """逐条打印匹配结果，并根据相似度分布给出阈值建议"""
+    from config import settings
+
+    skills, skill_matrix = skill_loader.get_skill_embeddings()
+    names = [skill.metadata.name for skill in skills]
+    queries = [query for query, _ in LABELLED_QUERIES]
+    similarities = np.clip(encode(queries) @ skill_matrix.T, 0.0, 1.0)
+
+    print(f"模型: {settings.EMBEDDING_MODEL}")
+    print(f"当前阈值: SEMANTIC_SIMILARITY_FLOOR={settings.SEMANTIC_SIMILARITY_FLOOR}, "
+          f"SEMANTIC_MIN_SIMILARITY={settings.SEMANTIC_MIN_SIMILARITY}\n")
+
+    # 使用独立的匹配器，避免共享实例的缓存影响结果
+    matcher = SkillMatcher()
+    positives: List[float] = []   # 与期望 Skill 的相似度
+    negatives: List[float] = []   # 普通聊天与最相似 Skill 的相似度
+    unrelated: List[float] = []   # 与非期望 Skill 的相似度
+    correct = 0
+    for (query, expected), row in zip(LABELLED_QUERIES, similarities):
+        if expected is None:
+            negatives.append(float(row.max()))
+            unrelated.extend(row.tolist())
+        else:
+            target = names.index(expected)
+            positives.append(float(row[target]))
+            unrelated.extend(np.delete(row, target).tolist())
+
+        matched = await matcher.match_skill(query)
+        actual = matched[0].metadata.name if matched else None
+        correct += actual == expected
+        best = int(np.argmax(row))
+        print(f"{'✅' if actual == expected else '❌'} {query!r}: 期望 {expected}, 实际 {actual}, "
+              f"最相似 {names[best]} ({row[best]:.3f})")
+    await matcher.close()
+
+    print(f"\n准确率: {correct}/{len(LABELLED_QUERIES)}")
+    print(f"期望 Skill 相似度: 最小 {min(positives):.3f}, 平均 {np.mean(positives):.3f}")
+    print(f"普通聊天最高相似度: 最大 {max(negatives):.3f}, 平均 {np.mean(negatives):.3f}")
+    print(f"无关 Skill 相似度: 平均 {np.mean(unrelated):.3f}")
+
+    # 下限取无关相似度的平均值；最低相似度取两类边界的中点，两类重叠时无法只靠阈值区分
+    print(f"\n建议 SEMANTIC_SIMILARITY_FLOOR: {np.mean(unrelated):.2f}")
+    if max(negatives) < min(positives):
+        print(f"建议 SEMANTIC_MIN_SIMILARITY: {(max(negatives) + min(positives)) / 2:.2f}")
+    else:
+        print("期望 Skill 与普通聊天的相似度有重叠，请调整 Skill 描述或更换模型")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
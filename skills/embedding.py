@@ -0,0 +1,25 @@
+# skills/embedding.py
+"""
+Skill 语义向量 - 使用本地 Embedding 模型计算文本向量
+"""
+from functools import lru_cache
+from typing import List
+import numpy as np
+
+
+@lru_cache(maxsize=1)
+def get_embedding_model():
+    """延迟加载本地 Embedding 模型（首次调用时加载，全局共享）"""
+    from sentence_transformers import SentenceTransformer
+    from config import settings
+
+    return SentenceTransformer(settings.EMBEDDING_MODEL)
+
+
+def encode(texts: List[str]) -> np.ndarray:
+    """将文本编码为 L2 归一化的向量矩阵，向量间的点积即余弦相似度"""
+    return get_embedding_model().encode(
+        texts,
+        normalize_embeddings=True,
+        convert_to_numpy=True
+    )
@@ -5,9 +5,14 @@ Skills 自动加载器 - 从 skills 目录自动发现和加载所有 Skills
 import importlib
 import importlib.util
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Type, Optional
+from typing import Dict, List, Type, Optional, Tuple
+import ahocorasick
+import numpy as np
+import pygtrie
 from .base import BaseSkill, SkillMetadata, DynamicPythonSkill
+from .embedding import encode
 
 
 class SkillLoader:
@@ -16,7 +21,15 @@ class SkillLoader:
     def __init__(self, skills_dir: Path):
         self.skills_dir = skills_dir
         self._skills: Dict[str, BaseSkill] = {}
+        # 不可变的 Skills 快照，匹配器按下标使用，避免每次请求复制字典
+        self.skills_tuple: Tuple[BaseSkill, ...] = ()
+        # 每次(重新)加载后递增，供依赖 Skills 的缓存判断是否失效
+        self.version = 0
+        self._skill_embeddings: Optional[Tuple[Tuple[BaseSkill, ...], np.ndarray]] = None
+        # Embedding 模型加载失败的原因，设置后匹配器跳过语义匹配，重新加载 Skills 时再尝试
+        self.embedding_error: Optional[str] = None
         self._load_all()
+        self._build_indexes()
     
     def _load_all(self):
         """加载所有 Skills"""
@@ -24,34 +37,119 @@ class SkillLoader:
             print(f"Skills directory not found: {self.skills_dir}")
             return
         
-        # 遍历 skills 目录下的所有子目录
-        for skill_dir in self.skills_dir.iterdir():
-            if not skill_dir.is_dir():
-                continue
-            
-            # 跳过 __pycache__ 等目录
-            if skill_dir.name.startswith("_") or skill_dir.name.startswith("."):
-                continue
-            
-            # 检查是否有 SKILL.md 文件
-            skill_md = skill_dir / "SKILL.md"
-            if not skill_md.exists():
-                print(f"Skipping {skill_dir.name}: No SKILL.md found")
-                continue
-            
-            # 尝试加载 Python 实现文件
-            py_file = skill_dir / "skill.py"
-            if py_file.exists():
-                # 加载自定义 Python Skill
-                skill = self._load_python_skill(skill_dir, py_file)
-            else:
-                # 使用动态 AI 执行的 Skill
-                skill = DynamicPythonSkill(skill_dir)
-            
+        # 遍历 skills 目录下的所有子目录，跳过 __pycache__ 等目录
+        skill_dirs = [
+            skill_dir for skill_dir in self.skills_dir.iterdir()
+            if skill_dir.is_dir()
+            and not skill_dir.name.startswith("_")
+            and not skill_dir.name.startswith(".")
+        ]
+        
+        # 各 Skill 的文件读取相互独立，使用线程池并行加载
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            skills = list(executor.map(self._build_skill, skill_dirs))
+        
+        # 全部加载完成后按目录顺序注册
+        for skill in skills:
             if skill:
                 self._skills[skill.metadata.name] = skill
                 print(f"✅ Loaded skill: {skill.metadata.name}")
     
+    def _build_skill(self, skill_dir: Path) -> Optional[BaseSkill]:
+        """加载单个 Skill 目录"""
+        # 检查是否有 SKILL.md 文件
+        skill_md = skill_dir / "SKILL.md"
+        if not skill_md.exists():
+            print(f"Skipping {skill_dir.name}: No SKILL.md found")
+            return None
+        
+        # 尝试加载 Python 实现文件
+        py_file = skill_dir / "skill.py"
+        if py_file.exists():
+            # 加载自定义 Python Skill
+            return self._load_python_skill(skill_dir, py_file)
+        
+        # 使用动态 AI 执行的 Skill
+        return DynamicPythonSkill(skill_dir)
+    
+    def _build_indexes(self):
+        """构建 Skills 快照、关键词/名称自动机和名称前缀树（均以 skills_tuple 中的下标表示 Skill）"""
+        self.skills_tuple = tuple(self._skills.values())
+        self._keyword_automaton = self._build_keyword_automaton()
+        # 前缀树只用于 get_skill 的最长前缀回退
+        self._name_trie = pygtrie.CharTrie(
+            (skill.metadata.name.lower(), index) for index, skill in enumerate(self.skills_tuple)
+        )
+    
+    def _build_keyword_automaton(self) -> ahocorasick.Automaton:
+        """构建覆盖所有 Skills 关键词和名称的 Aho–Corasick 自动机"""
+        # 同一个词可能是多个 Skill 的关键词，也可能同时是某个 Skill 的名称
+        keyword_skills: Dict[str, List[int]] = {}
+        name_skills: Dict[str, List[int]] = {}
+        for index, skill in enumerate(self.skills_tuple):
+            for kw in skill.keywords:
+                keyword_skills.setdefault(kw, []).append(index)
+            name_skills.setdefault(skill.metadata.name.lower(), []).append(index)
+        
+        automaton = ahocorasick.Automaton()
+        for word in keyword_skills.keys() | name_skills.keys():
+            automaton.add_word(word, (
+                word,
+                np.array(keyword_skills.get(word, []), dtype=np.intp),
+                np.array(name_skills.get(word, []), dtype=np.intp)
+            ))
+        
+        if len(automaton):
+            automaton.make_automaton()
+        return automaton
+    
+    def find_matches(self, text: str) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """
+        一次线性扫描找出文本中出现的所有 Skill 关键词和名称（文本需已转为小写）
+        
+        Returns:
+            (keywords, named) - keywords 为 {关键词: 包含该关键词的 Skills 下标}，
+            named 为名称出现在文本中的 Skills 下标
+        """
+        keywords: Dict[str, np.ndarray] = {}
+        names: Dict[str, np.ndarray] = {}
+        if self._keyword_automaton.kind == ahocorasick.AHOCORASICK:
+            for _, (word, keyword_indices, name_indices) in self._keyword_automaton.iter(text):
+                if keyword_indices.size:
+                    keywords[word] = keyword_indices
+                if name_indices.size:
+                    names[word] = name_indices
+        
+        named = np.concatenate(list(names.values())) if names else np.zeros(0, dtype=np.intp)
+        return keywords, named
+    
+    def get_skill_embeddings(self) -> Tuple[Tuple[BaseSkill, ...], np.ndarray]:
+        """
+        获取所有 Skills 的语义向量矩阵（首次调用时计算，Skills 变化后重新计算）
+        
+        Returns:
+            (skills, matrix) - matrix 的第 i 行对应 skills[i]
+        """
+        if self.embedding_error is not None:
+            raise RuntimeError(f"Embedding 模型不可用: {self.embedding_error}")
+        
+        skills = self.skills_tuple
+        cached = self._skill_embeddings
+        if cached is None or cached[0] is not skills:
+            # 只编码名称和描述：模型最多读取 128 个 token，完整的 SKILL.md 正文会稀释描述的语义
+            texts = [
+                f"{skill.metadata.name}: {skill.metadata.description}"
+                for skill in skills
+            ]
+            try:
+                matrix = encode(texts) if texts else np.zeros((0, 0), dtype=np.float32)
+            except Exception as e:
+                # 模型不可用（未安装、离线无法下载等）只记录一次，避免每个请求都重试加载
+                self.embedding_error = str(e)
+                raise
+            cached = self._skill_embeddings = (skills, matrix)
+        return cached
+    
     def _load_python_skill(self, skill_dir: Path, py_file: Path) -> Optional[BaseSkill]:
         """加载自定义 Python Skill"""
         try:
@@ -84,8 +182,13 @@ class SkillLoader:
             return None
     
     def get_skill(self, name: str) -> Optional[BaseSkill]:
-        """获取指定 Skill"""
-        return self._skills.get(name)
+        """获取指定 Skill，精确匹配失败时回退到最长前缀匹配"""
+        skill = self._skills.get(name)
+        if skill is None:
+            step = self._name_trie.longest_prefix(name.lower())
+            if step:
+                skill = self.skills_tuple[step.value]
+        return skill
     
     def get_all_skills(self) -> Dict[str, BaseSkill]:
         """获取所有 Skills"""
@@ -99,6 +202,9 @@ class SkillLoader:
         """重新加载所有 Skills"""
         self._skills.clear()
         self._load_all()
+        self._build_indexes()
+        self.embedding_error = None
+        self.version += 1
 
 
 # 全局 Skill Loader 实例
@@ -2,201 +2,262 @@
 """
 Skill 匹配器 - 根据用户请求自动选择合适的 Skill
 """
-import re
-from typing import List, Optional, Tuple, Dict
+import asyncio
+import numpy as np
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple, Dict, Set
 from pathlib import Path
 from .loader import skill_loader
 from .base import BaseSkill
+from .embedding import encode
 
 
 class SkillMatcher:
     """Skill 匹配器"""
     
-    def __init__(self):
+    def __init__(self, flush_interval: float = 0.01, max_batch_size: int = 16, cache_size: int = 1024):
+        from config import settings
+
         self.loader = skill_loader
+        
+        # 语义得分校准：原始余弦相似度先减去下限再缩放；达到最低相似度的 Skill 才会被使用
+        self.similarity_floor = settings.SEMANTIC_SIMILARITY_FLOOR
+        self.min_similarity = settings.SEMANTIC_MIN_SIMILARITY
+        
+        # 匹配结果 LRU 缓存：相同（忽略大小写和首尾空白）的消息直接返回上次的结果
+        self.cache_size = cache_size
+        self._match_cache: OrderedDict = OrderedDict()
+        self._cache_version = self.loader.version
+        
+        # 语义匹配批处理：在 flush_interval 秒内到达的请求合并为一次向量编码
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self._batch_queue: Optional[asyncio.Queue] = None
+        self._batch_worker: Optional[asyncio.Task] = None
+        self._batch_tasks: Set[asyncio.Task] = set()
     
-    def match_skill(self, user_message: str, conversation_history: List[Dict] = None) -> Optional[Tuple[BaseSkill, float]]:
+    async def match_skill(self, user_message: str, conversation_history: Iterable[Dict] = None) -> Optional[Tuple[BaseSkill, float]]:
         """
         根据用户消息匹配最合适的 Skill
         
         Returns:
             (skill, confidence) - 匹配到的 Skill 和置信度 (0-1)
         """
+        # Skills 重新加载后缓存失效
+        version = self.loader.version
+        if self._cache_version != version:
+            self._match_cache.clear()
+            self._cache_version = version
+        
+        cache_key = user_message.strip().lower()
+        if cache_key in self._match_cache:
+            self._match_cache.move_to_end(cache_key)
+            return self._match_cache[cache_key]
+        
+        result, semantic_ok = await self._match_skill_uncached(user_message, conversation_history)
+        
+        # 匹配期间发生了重新加载则不缓存旧结果；语义匹配失败时的结果也不缓存，模型恢复后重新匹配
+        if semantic_ok and self.loader.version == version:
+            self._match_cache[cache_key] = result
+            if len(self._match_cache) > self.cache_size:
+                self._match_cache.popitem(last=False)
+        
+        return result
+    
+    async def _match_skill_uncached(self, user_message: str, conversation_history: Iterable[Dict] = None) -> Tuple[Optional[Tuple[BaseSkill, float]], bool]:
+        """
+        执行完整的匹配流程（不经过缓存）
+        
+        Returns:
+            (match, semantic_ok) - match 同 match_skill；semantic_ok 为 False 表示语义匹配不可用，结果不应缓存
+        """
         if conversation_history is None:
             conversation_history = []
         
-        # 获取所有启用的 Skills
-        skills = list(self.loader.get_all_skills().values())
+        # 获取所有启用的 Skills（加载时构建的不可变快照，得分数组按其下标对齐）
+        skills = self.loader.skills_tuple
         
         if not skills:
-            return None
+            return None, True
         
         # 方法1: 基于关键词匹配
-        keyword_matches = self._match_by_keywords(user_message, skills)
+        keyword_scores = self._match_by_keywords(user_message)
         
-        # 方法2: 基于语义匹配（使用 AI）
-        semantic_matches = self._match_by_semantic(user_message, skills, conversation_history)
+        # 关键词得分已经足够高时直接返回，省去语义匹配
+        best_index = int(np.argmax(keyword_scores))
+        if keyword_scores[best_index] >= 0.8:
+            return (skills[best_index], float(keyword_scores[best_index])), True
         
-        # 综合两种方法的结果
-        scores = {}
-        for skill in skills:
-            keyword_score = keyword_matches.get(skill, 0.0)
-            semantic_score = semantic_matches.get(skill, 0.0)
-            
-            # 加权平均（关键词 40%，语义 60%）
-            scores[skill] = keyword_score * 0.4 + semantic_score * 0.6
+        # 方法2: 基于语义匹配（向量相似度）
+        similarities = await self._match_by_semantic(user_message, skills, conversation_history)
+        if similarities is None:
+            # Embedding 模型不可用或本次编码失败时只保留上面的关键词快捷匹配
+            return None, False
+        semantic_scores = self._calibrate_similarities(similarities)
         
-        # 找到得分最高的 Skill
-        best_skill = max(scores.items(), key=lambda x: x[1])
+        # 综合两种方法的结果（加权平均：关键词 40%，语义 60%）
+        scores = keyword_scores * 0.4 + semantic_scores * 0.6
         
-        # 如果置信度太低，返回 None
-        if best_skill[1] < 0.3:
-            return None
+        # 是否使用 Skill 只由语义相似度决定：关键词容易误命中 "the"、"are" 等常见词，
+        # 中文消息又往往没有关键词命中，因此关键词只用于在候选 Skills 之间排序
+        candidates = similarities >= self.min_similarity
+        if not candidates.any():
+            return None, True
         
-        return best_skill
+        # 在语义上足够接近的 Skills 中找到综合得分最高的
+        best_index = int(np.argmax(np.where(candidates, scores, -1.0)))
+        
+        return (skills[best_index], float(scores[best_index])), True
+    
+    def _calibrate_similarities(self, similarities: np.ndarray) -> np.ndarray:
+        """将原始余弦相似度映射为 0-1 的语义得分：低于下限记 0，其余线性缩放"""
+        floor = self.similarity_floor
+        return np.clip((similarities - floor) / (1.0 - floor), 0.0, 1.0)
     
-    def _match_by_keywords(self, user_message: str, skills: List[BaseSkill]) -> Dict[BaseSkill, float]:
-        """基于关键词匹配"""
-        scores = {}
+    def _match_by_keywords(self, user_message: str) -> np.ndarray:
+        """基于关键词匹配，返回与 loader.skills_tuple 对齐的得分数组"""
         user_message_lower = user_message.lower()
         
-        for skill in skills:
-            score = 0.0
-            
-            # 检查 Skill 名称是否在消息中
-            if skill.metadata.name.lower() in user_message_lower:
-                score += 0.5
-            
-            # 从描述中提取关键词
-            keywords = self._extract_keywords(skill.metadata.description)
-            keywords.extend(self._extract_keywords(skill.get_full_content()))
+        # 一次扫描找出消息中出现的所有关键词和 Skill 名称（每个关键词只计一次）
+        keywords, named = self.loader.find_matches(user_message_lower)
+        matched_counts = np.zeros(len(self.loader.skills_tuple))
+        for indices in keywords.values():
+            matched_counts[indices] += 1
+        
+        # 计算关键词匹配度
+        scores = np.minimum(matched_counts * 0.2, 0.5)
+        
+        # Skill 名称出现在消息中
+        scores[named] += 0.5
+        
+        return np.minimum(scores, 1.0)
+    
+    async def _match_by_semantic(self, user_message: str, skills: Tuple[BaseSkill, ...], conversation_history: Iterable[Dict]) -> Optional[np.ndarray]:
+        """基于语义匹配（向量相似度）- 请求进入队列，与同一时间窗口内的其他请求合并为一次编码，模型不可用或编码失败时返回 None"""
+        if self.loader.embedding_error is not None:
+            return None
+        queue = self._ensure_batch_worker()
+        future = asyncio.get_running_loop().create_future()
+        await queue.put((user_message, skills, future))
+        return await future
+    
+    def _ensure_batch_worker(self) -> asyncio.Queue:
+        """在当前事件循环中按需启动批处理后台任务"""
+        loop = asyncio.get_running_loop()
+        if self._batch_worker is None or self._batch_worker.done() or self._batch_worker.get_loop() is not loop:
+            self._batch_queue = asyncio.Queue()
+            self._batch_worker = loop.create_task(self._run_batch_worker())
+        return self._batch_queue
+    
+    async def _run_batch_worker(self):
+        """收集 flush_interval 时间窗口内的请求，合并后批量匹配"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._batch_queue.get()]
+            # 队列为空且没有进行中的编码时说明服务空闲，立即处理，不等待时间窗口
+            idle = self._batch_queue.empty() and not self._batch_tasks
+            deadline = loop.time() + (0 if idle else self.flush_interval)
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._batch_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
             
-            # 计算关键词匹配度
-            matched_keywords = sum(1 for kw in keywords if kw in user_message_lower)
-            if matched_keywords > 0:
-                score += min(matched_keywords * 0.2, 0.5)
+            # 按 Skills 列表分组（热重载前后入队的请求可能不同）
+            groups: Dict[Tuple[BaseSkill, ...], List] = {}
+            for item in batch:
+                groups.setdefault(item[1], []).append(item)
             
-            scores[skill] = min(score, 1.0)
-        
-        return scores
+            # 不等待编码完成，继续收集下一批请求
+            for skills, items in groups.items():
+                task = loop.create_task(self._dispatch_batch(skills, items))
+                self._batch_tasks.add(task)
+                task.add_done_callback(self._batch_tasks.discard)
+    
+    async def _dispatch_batch(self, skills: Tuple[BaseSkill, ...], items: List):
+        """执行一批匹配，并把结果分发给各个等待中的请求"""
+        results = await self.match_batch([message for message, _, _ in items], skills)
+        for i, (_, _, future) in enumerate(items):
+            if not future.done():
+                future.set_result(None if results is None else results[i])
     
-    def _match_by_semantic(self, user_message: str, skills: List[BaseSkill], conversation_history: List[Dict]) -> Dict[BaseSkill, float]:
-        """基于语义匹配（使用 AI）"""
+    async def match_batch(self, messages: List[str], skills: Optional[Tuple[BaseSkill, ...]] = None) -> Optional[np.ndarray]:
+        """
+        一次向量编码完成多条用户消息的语义匹配
+        
+        使用本地 Embedding 模型计算用户消息与每个 Skill 的余弦相似度，
+        不需要调用 LLM。
+        
+        Returns:
+            形状为 (len(messages), len(skills)) 的原始余弦相似度矩阵（已截断到 0-1，未校准），
+            Embedding 模型不可用或编码失败时返回 None
+        """
+        if skills is None:
+            skills = self.loader.skills_tuple
+        
+        if not messages or not skills:
+            return np.zeros((len(messages), len(skills)))
+        
         try:
-            from openai import OpenAI
-            from config import settings
-            import httpx
-            import json
-
-            # 创建带超时的 httpx 客户端
-            http_client = httpx.Client(timeout=30.0)
-
-            # 构建提示词
-            skill_descriptions = "\n".join([
-                f"{i+1}. {skill.metadata.name}: {skill.metadata.description}"
-                for i, skill in enumerate(skills)
-            ])
-
-            prompt = f"""你是 AI 助手，需要判断用户的请求应该使用哪个 Skill。
-
-## 可用的 Skills
-{skill_descriptions}
-
-## 用户请求
-"{user_message}"
-
-## 任务
-请分析用户请求，并判断它应该使用哪个 Skill。
-- 如果用户请求明显匹配某个 Skill，返回该 Skill 的编号 (1-{len(skills)})
-- 如果用户请求不匹配任何 Skill，返回 0
-- 如果用户请求需要多个 Skill，返回最相关的一个
-
-只返回数字，不要返回其他内容。"""
-
-            client = OpenAI(
-                api_key=settings.OPENAI_API_KEY,
-                base_url=settings.OPENAI_BASE_URL,
-                http_client=http_client
-            )
+            def compute_similarities() -> Tuple[Tuple[BaseSkill, ...], np.ndarray]:
+                loaded_skills, skill_matrix = self.loader.get_skill_embeddings()
+                query_matrix = encode(messages)
+                # 向量均已归一化，矩阵乘法即得到所有消息与所有 Skills 的余弦相似度
+                return loaded_skills, np.clip(query_matrix @ skill_matrix.T, 0.0, 1.0)
             
-            response = client.chat.completions.create(
-                model="deepseek-chat",
-                messages=[
-                    {"role": "system", "content": "你是 Skill 匹配专家。"},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=10,
-                temperature=0.1  # 低温度以获得确定性结果
-            )
+            # 模型推理是 CPU 密集型操作，放到线程中执行以免阻塞事件循环
+            loaded_skills, similarities = await asyncio.to_thread(compute_similarities)
             
-            result = response.choices[0].message.content.strip()
+            if loaded_skills is skills:
+                return similarities
             
-            # 解析结果
-            try:
-                skill_index = int(result)
-                if skill_index == 0:
-                    return {skill: 0.0 for skill in skills}
-                elif 1 <= skill_index <= len(skills):
-                    matched_skill = skills[skill_index - 1]
-                    # 给匹配的 Skill 高分，其他的低分
-                    return {
-                        skill: 0.9 if skill == matched_skill else 0.1
-                        for skill in skills
-                    }
-            except ValueError:
-                pass
-            
-            # 如果解析失败，返回默认分数
-            return {skill: 0.0 for skill in skills}
+            # 入队后 Skills 被重新加载，按 Skill 重新对齐列
+            columns = {skill: i for i, skill in enumerate(loaded_skills)}
+            results = np.zeros((len(messages), len(skills)))
+            for j, skill in enumerate(skills):
+                if skill in columns:
+                    results[:, j] = similarities[:, columns[skill]]
+            return results
             
         except Exception as e:
             print(f"Semantic matching error: {e}")
-            return {skill: 0.0 for skill in skills}
+            return None
     
-    def _extract_keywords(self, text: str) -> List[str]:
-        """从文本中提取关键词"""
-        # 简单的关键词提取：提取英文单词和常见中文术语
-        keywords = []
-        
-        # 提取英文单词（长度 >= 3）
-        english_words = re.findall(r'\b[a-zA-Z]{3,}\b', text.lower())
-        keywords.extend(english_words)
-        
-        # 提取常见的技术术语和动作词
-        action_words = [
-            'review', 'search', 'find', 'install', 'get', 'use', 'create',
-            'generate', 'execute', 'run', 'code', 'test', 'debug', 'fix',
-            '分析', '搜索', '查找', '安装', '获取', '使用', '创建', '生成',
-            '执行', '运行', '代码', '测试', '调试', '修复', '审查'
-        ]
-        
-        for word in action_words:
-            if word in text.lower():
-                keywords.append(word)
-        
-        return list(set(keywords))
+    async def close(self):
+        """停止批处理后台任务"""
+        if self._batch_worker is not None:
+            self._batch_worker.cancel()
+            try:
+                await self._batch_worker
+            except asyncio.CancelledError:
+                pass
+        self._batch_worker = None
+        self._batch_queue = None
     
-    def rank_skills(self, user_message: str, top_n: int = 3) -> List[Tuple[BaseSkill, float]]:
+    async def rank_skills(self, user_message: str, top_n: int = 3) -> List[Tuple[BaseSkill, float]]:
         """对 Skills 进行排序，返回前 N 个最相关的"""
-        skills = list(self.loader.get_all_skills().values())
+        skills = self.loader.skills_tuple
         
         if not skills:
             return []
         
         # 匹配所有 Skills
-        keyword_scores = self._match_by_keywords(user_message, skills)
-        semantic_scores = self._match_by_semantic(user_message, skills, [])
+        keyword_scores = self._match_by_keywords(user_message)
+        similarities = await self._match_by_semantic(user_message, skills, [])
+        if similarities is None:
+            similarities = np.zeros(len(skills))
+        semantic_scores = self._calibrate_similarities(similarities)
         
         # 计算综合得分
-        ranked = []
-        for skill in skills:
-            score = keyword_scores[skill] * 0.4 + semantic_scores[skill] * 0.6
-            ranked.append((skill, score))
+        scores = keyword_scores * 0.4 + semantic_scores * 0.6
         
-        # 按得分降序排序
-        ranked.sort(key=lambda x: x[1], reverse=True)
+        # 按得分降序排序（稳定排序，同分时保持加载顺序）
+        ranked = np.argsort(-scores, kind="stable")[:top_n]
         
-        return ranked[:top_n]
+        return [(skills[i], float(scores[i])) for i in ranked]
 
 
 # 全局 Skill Matcher 实例